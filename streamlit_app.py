@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime
+import hashlib
+import io
 import re
 
 # Set page config
@@ -33,30 +34,53 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def extract_first_sentence(text):
-    """Extract the first sentence from post title"""
-    if pd.isna(text) or text == "":
-        return ""
+# Common sentence endings followed by whitespace
+_SENT_RE = re.compile(r'[.!?]\s+')
+
+def extract_first_sentences(titles):
+    """Extract the first sentence from each post title"""
+    titles = titles.astype('string').fillna('')
     
-    # Split by common sentence endings
-    sentences = re.split(r'[.!?]\s+', str(text))
-    first_sentence = sentences[0].strip()
+    # Titles without a sentence break are their own first sentence, so only split the rest
+    first_sentence = titles.str.strip()
+    has_sep = titles.str.contains(_SENT_RE, regex=True, na=False)
     
-    # If the first sentence is very short, try to get more context
-    if len(first_sentence) < 20 and len(sentences) > 1:
-        first_sentence = sentences[0] + ". " + sentences[1]
+    if has_sep.any():
+        # Split by common sentence endings, keeping only the first two sentences
+        sentences = titles[has_sep].str.split(_SENT_RE, n=2, regex=True)
+        first_raw = sentences.str[0]
+        second = sentences.str[1]
+        split_first = first_raw.str.strip()
+        
+        # If the first sentence is very short, try to get more context
+        short = split_first.str.len() < 20
+        first_sentence[has_sep] = split_first.mask(short, first_raw + ". " + second)
     
     # Limit length for display
-    if len(first_sentence) > 100:
-        first_sentence = first_sentence[:97] + "..."
-    
-    return first_sentence
+    return first_sentence.where(first_sentence.str.len() <= 100, first_sentence.str.slice(0, 97) + "...")
+
+# Rows formatted and sent to the table widget; the CSV download still has every row
+MAX_TABLE_ROWS = 500
 
-def load_and_process_data(uploaded_file):
-    """Load and process the LinkedIn analytics data"""
+def read_excel_sheet(file_bytes, file_name):
+    """Read the 'All posts' sheet, preferring the fast calamine engine"""
+    read_kwargs = dict(sheet_name='All posts', header=1)
+    try:
+        return pd.read_excel(io.BytesIO(file_bytes), engine="calamine", **read_kwargs)
+    except ImportError:
+        # python-calamine not installed; real parse errors propagate to the caller
+        fallback_engine = "xlrd" if file_name.lower().endswith('.xls') else "openpyxl"
+        return pd.read_excel(io.BytesIO(file_bytes), engine=fallback_engine, **read_kwargs)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_and_process_data(file_bytes, file_name):
+    """Load and process the LinkedIn analytics data
+
+    Cached on the raw file bytes so the Excel parse only runs once per upload.
+    """
     try:
         # Read the Excel file, skipping the first row to use the second row as the header
-        df = pd.read_excel(uploaded_file, sheet_name='All posts', header=1)
+        df = read_excel_sheet(file_bytes, file_name)
         
         # Standardize column names to lowercase and strip whitespace
         df.columns = [str(col).lower().strip() for col in df.columns]
@@ -67,22 +91,27 @@ def load_and_process_data(uploaded_file):
             return None
 
         # Clean and process the data
-        df['post title (first sentence)'] = df['post title'].apply(extract_first_sentence)
+        df['post title (first sentence)'] = extract_first_sentences(df['post title']).astype('string[pyarrow]')
         
         # Convert date column
         if 'created date' in df.columns:
             df['created date'] = pd.to_datetime(df['created date'])
         
-        # Convert percentage columns to numeric
-        if 'engagement rate' in df.columns:
-            df['engagement rate'] = pd.to_numeric(df['engagement rate'], errors='coerce')
-        
-        if 'click through rate (ctr)' in df.columns:
-            df['click through rate (ctr)'] = pd.to_numeric(df['click through rate (ctr)'], errors='coerce')
+        # Convert percentage columns to numeric, skipping the parse when the engine already returned numbers
+        # float32 is plenty for two-decimal display and halves memory per column
+        for col in ('engagement rate', 'click through rate (ctr)'):
+            if col in df.columns:
+                if not pd.api.types.is_numeric_dtype(df[col]):
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                df[col] = df[col].astype('float32')
         
-        # Convert impressions to numeric
+        # Convert impressions to the narrowest numeric type that fits
         if 'impressions' in df.columns:
-            df['impressions'] = pd.to_numeric(df['impressions'], errors='coerce')
+            df['impressions'] = pd.to_numeric(df['impressions'], errors='coerce', downcast='unsigned')
+        
+        # Post type only has a handful of distinct values
+        if 'post type' in df.columns:
+            df['post type'] = df['post type'].astype('category')
         
         return df
     
@@ -90,12 +119,68 @@ def load_and_process_data(uploaded_file):
         st.error(f"Error loading data: {str(e)}")
         return None
 
-def create_summary_metrics(df):
+def top_rows(df, metric, columns, top_n):
+    """Return the top_n rows by metric, largest first, ignoring missing values"""
+    values = df[metric].to_numpy(dtype='float64', na_value=np.nan)
+    
+    # argpartition selects the top_n in O(N) without sorting the whole column
+    k = min(top_n, len(values))
+    if k == 0:
+        return df.iloc[:0][columns]
+    idx = np.argpartition(np.nan_to_num(values, nan=-np.inf), -k)[-k:]
+    idx = idx[~np.isnan(values[idx])]
+    idx = idx[np.argsort(-values[idx], kind='stable')]
+    
+    return df.iloc[idx][columns]
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def compute_aggregates(_df, data_key, top_n=10):
+    """Compute the aggregates shared by the metrics and charts in a single pass
+
+    Cached on data_key (upload digest plus applied filters); the frame itself is not hashed.
+    """
+    df = _df
+    
+    # Group by date and calculate average engagement
+    daily_stats = None
+    if 'created date' in df.columns:
+        # Floor to whole days as datetime64 so grouping uses int64 keys rather than date objects
+        day_keys = df['created date'].to_numpy().astype('datetime64[D]')
+        daily_stats = df.groupby(day_keys, sort=True).agg({
+            'engagement rate': 'mean',
+            'impressions': 'sum',
+            'click through rate (ctr)': 'mean'
+        }).rename_axis('created date').reset_index()
+    
+    totals = (
+        len(df),
+        df['impressions'].sum() if 'impressions' in df.columns else 0,
+        df['engagement rate'].mean() if 'engagement rate' in df.columns else 0,
+        df['click through rate (ctr)'].mean() if 'click through rate (ctr)' in df.columns else 0
+    )
+    
+    # Get top posts for each ranking metric
+    top_posts = {
+        metric: top_rows(df, metric, ['post title (first sentence)', metric, 'impressions'], top_n)
+        for metric in ('engagement rate', 'click through rate (ctr)')
+        if metric in df.columns
+    }
+    
+    return {'daily': daily_stats, 'totals': totals, 'top_posts': top_posts}
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def df_to_csv_bytes(_df, data_key):
+    """Serialize the filtered data for the CSV download button
+
+    Cached on data_key like compute_aggregates; few entries since each holds the full CSV.
+    """
+    return _df.to_csv(index=False).encode('utf-8')
+
+def create_summary_metrics(aggregates):
     """Create summary metrics cards"""
-    total_posts = len(df)
-    avg_engagement = df['engagement rate'].mean() * 100 if 'engagement rate' in df.columns else 0
-    avg_ctr = df['click through rate (ctr)'].mean() * 100 if 'click through rate (ctr)' in df.columns else 0
-    total_impressions = df['impressions'].sum() if 'impressions' in df.columns else 0
+    total_posts, total_impressions, avg_engagement, avg_ctr = aggregates['totals']
+    avg_engagement *= 100
+    avg_ctr *= 100
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -123,17 +208,13 @@ def create_summary_metrics(df):
             value=f"{avg_ctr:.2f}%"
         )
 
-def create_engagement_trend_chart(df):
+def create_engagement_trend_chart(aggregates):
     """Create engagement trend over time"""
-    if 'created date' not in df.columns:
-        return None
+    import plotly.graph_objects as go
     
-    # Group by date and calculate average engagement
-    daily_stats = df.groupby(df['created date'].dt.date).agg({
-        'engagement rate': 'mean',
-        'impressions': 'sum',
-        'click through rate (ctr)': 'mean'
-    }).reset_index()
+    daily_stats = aggregates['daily']
+    if daily_stats is None:
+        return None
     
     fig = go.Figure()
     
@@ -157,24 +238,25 @@ def create_engagement_trend_chart(df):
     
     return fig
 
-def create_top_posts_chart(df, metric='engagement rate', top_n=10):
+def create_top_posts_chart(aggregates, metric='engagement rate', top_n=10):
     """Create top posts chart"""
-    if metric not in df.columns:
+    import plotly.express as px
+    
+    if metric not in aggregates['top_posts']:
         return None
     
     # Get top posts
-    top_posts = df.nlargest(top_n, metric)[['post title (first sentence)', metric, 'impressions']].copy()
+    top_posts = aggregates['top_posts'][metric].head(top_n)
     
     # Convert to percentage if needed
     if metric in ['engagement rate', 'click through rate (ctr)']:
-        top_posts[f'{metric} (%)'] = top_posts[metric] * 100
-        y_col = f'{metric} (%)'
+        x_values = (top_posts[metric] * 100).rename(f'{metric} (%)')
     else:
-        y_col = metric
+        x_values = metric
     
     fig = px.bar(
         top_posts,
-        x=y_col,
+        x=x_values,
         y='post title (first sentence)',
         orientation='h',
         title=f"Top {top_n} Posts by {metric.replace('_', ' ').title()}",
@@ -190,21 +272,93 @@ def create_top_posts_chart(df, metric='engagement rate', top_n=10):
 
 def create_scatter_plot(df):
     """Create impressions vs engagement scatter plot"""
+    import plotly.express as px
+    
     if 'impressions' not in df.columns or 'engagement rate' not in df.columns:
         return None
     
+    # Only hand Plotly the columns it plots so it doesn't serialize the whole frame
+    hover_columns = [col for col in ('post title (first sentence)', 'click through rate (ctr)') if col in df.columns]
+    plot_df = df[['impressions', 'engagement rate', *hover_columns]]
+    
+    # WebGL keeps the plot responsive for exports with thousands of posts
     fig = px.scatter(
-        df,
+        plot_df,
         x='impressions',
-        y=df['engagement rate'] * 100,
-        hover_data=['post title (first sentence)', 'click through rate (ctr)'],
+        y=plot_df['engagement rate'] * 100,
+        hover_data=hover_columns,
         title="Impressions vs Engagement Rate",
-        labels={'y': 'Engagement Rate (%)'}
+        labels={'y': 'Engagement Rate (%)'},
+        render_mode='webgl'
     )
     
     fig.update_layout(height=400)
     return fig
 
+@st.fragment
+def render_table(df, data_key):
+    """Render the searchable post table and CSV download
+
+    Runs as a fragment so typing in the search box only reruns this section.
+    """
+    # Select columns to display
+    display_columns = [
+        'post title (first sentence)',
+        'impressions',
+        'engagement rate',
+        'click through rate (ctr)'
+    ]
+    
+    # Filter columns that exist in the dataframe
+    available_columns = [col for col in display_columns if col in df.columns]
+    
+    if 'created date' in df.columns:
+        available_columns.insert(1, 'created date')
+    
+    if 'post type' in df.columns:
+        available_columns.append('post type')
+    
+    # Search functionality
+    search_term = st.text_input("🔍 Search posts", placeholder="Enter keywords to search in post titles...")
+    
+    # Apply the search to the source data, then only materialize the rows the table shows
+    if search_term:
+        matches = df['post title (first sentence)'].str.contains(search_term, case=False, na=False, regex=False)
+        row_positions = np.flatnonzero(matches.to_numpy())
+    else:
+        row_positions = np.arange(len(df))
+    
+    display_df = df.iloc[row_positions[:MAX_TABLE_ROWS], df.columns.get_indexer(available_columns)].copy()
+    
+    if len(row_positions) > MAX_TABLE_ROWS:
+        st.caption(f"Showing the first {MAX_TABLE_ROWS:,} of {len(row_positions):,} matching posts. "
+                   "Download the CSV for the full data.")
+    
+    # Format percentage and impressions columns for display only; the underlying columns stay numeric
+    # and only the displayed rows are formatted
+    styler = display_df.style.format({
+        col: '{:.2%}' for col in ('engagement rate', 'click through rate (ctr)')
+        if col in display_df.columns
+    })
+    
+    if 'impressions' in display_df.columns:
+        styler = styler.format('{:,.0f}', subset=['impressions'], na_rep='0')
+    
+    # Display the table
+    st.dataframe(
+        styler,
+        use_container_width=True,
+        height=400
+    )
+    
+    # Download button
+    st.download_button(
+        label="📥 Download filtered data as CSV",
+        data=df_to_csv_bytes(df, data_key),
+        file_name=f"linkedin_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv"
+    )
+
 def main():
     st.title("📊 LinkedIn Analytics Dashboard")
     st.markdown("Upload your LinkedIn content analytics Excel file to visualize your post performance.")
@@ -219,39 +373,54 @@ def main():
     if uploaded_file is not None:
         # Load and process data
         with st.spinner("Loading and processing data..."):
-            df = load_and_process_data(uploaded_file)
+            file_bytes = uploaded_file.getvalue()
+            df = load_and_process_data(file_bytes, uploaded_file.name)
         
         if df is not None:
             st.success(f"✅ Successfully loaded {len(df)} posts!")
             
             # Summary metrics
             st.markdown("## 📈 Key Metrics")
-            create_summary_metrics(df)
+            # Identifies the uploaded data; together with the applied filters it keys the derived caches
+            file_digest = hashlib.sha256(file_bytes).hexdigest()
+            create_summary_metrics(compute_aggregates(df, (file_digest, ())))
             
             # Sidebar filters
             st.sidebar.header("🔍 Filters")
             
+            # Build a single row mask so the dataframe is only filtered once
+            mask = np.ones(len(df), dtype=bool)
+            applied_filters = {}
+            
             # Post type filter
             if 'post type' in df.columns:
-                post_types = ['All'] + list(df['post type'].unique())
+                post_types = ['All', *df['post type'].cat.categories]
                 selected_post_type = st.sidebar.selectbox("Post Type", post_types)
                 
                 if selected_post_type != 'All':
-                    df = df[df['post type'] == selected_post_type]
+                    mask &= (df['post type'] == selected_post_type).to_numpy()
+                    applied_filters['post type'] = selected_post_type
             
             # Date range filter
             if 'created date' in df.columns:
+                created_dates = df['created date'][mask]
                 date_range = st.sidebar.date_input(
                     "Date Range",
-                    value=(df['created date'].min().date(), df['created date'].max().date()),
-                    min_value=df['created date'].min().date(),
-                    max_value=df['created date'].max().date()
+                    value=(created_dates.min().date(), created_dates.max().date()),
+                    min_value=created_dates.min().date(),
+                    max_value=created_dates.max().date()
                 )
                 
                 if len(date_range) == 2:
                     start_date, end_date = date_range
-                    df = df[(df['created date'].dt.date >= start_date) & 
-                           (df['created date'].dt.date <= end_date)]
+                    created_days = df['created date'].to_numpy().astype('datetime64[D]')
+                    mask &= (created_days >= np.datetime64(start_date)) & (created_days <= np.datetime64(end_date))
+                    applied_filters['date range'] = (start_date, end_date)
+            
+            df = df[mask]
+            data_key = (file_digest, tuple(applied_filters.items()))
+            
+            aggregates = compute_aggregates(df, data_key)
             
             # Charts section
             st.markdown("## 📊 Analytics Charts")
@@ -260,7 +429,7 @@ def main():
             
             with col1:
                 # Engagement trend
-                trend_fig = create_engagement_trend_chart(df)
+                trend_fig = create_engagement_trend_chart(aggregates)
                 if trend_fig:
                     st.plotly_chart(trend_fig, use_container_width=True)
             
@@ -274,71 +443,19 @@ def main():
             col3, col4 = st.columns(2)
             
             with col3:
-                top_engagement_fig = create_top_posts_chart(df, 'engagement rate')
+                top_engagement_fig = create_top_posts_chart(aggregates, 'engagement rate')
                 if top_engagement_fig:
                     st.plotly_chart(top_engagement_fig, use_container_width=True)
             
             with col4:
-                top_ctr_fig = create_top_posts_chart(df, 'click through rate (ctr)')
+                top_ctr_fig = create_top_posts_chart(aggregates, 'click through rate (ctr)')
                 if top_ctr_fig:
                     st.plotly_chart(top_ctr_fig, use_container_width=True)
             
             # Data table
             st.markdown("## 📋 Post Performance Table")
             
-            # Select columns to display
-            display_columns = [
-                'post title (first sentence)',
-                'impressions',
-                'engagement rate',
-                'click through rate (ctr)'
-            ]
-            
-            # Filter columns that exist in the dataframe
-            available_columns = [col for col in display_columns if col in df.columns]
-            
-            if 'created date' in df.columns:
-                available_columns.insert(1, 'created date')
-            
-            if 'post type' in df.columns:
-                available_columns.append('post type')
-            
-            # Format the display dataframe
-            display_df = df[available_columns].copy()
-            
-            # Format percentage columns
-            if 'engagement rate' in display_df.columns:
-                display_df['engagement rate'] = (display_df['engagement rate'] * 100).round(2).astype(str) + '%'
-            
-            if 'click through rate (ctr)' in display_df.columns:
-                display_df['click through rate (ctr)'] = (display_df['click through rate (ctr)'] * 100).round(2).astype(str) + '%'
-            
-            # Format impressions
-            if 'impressions' in display_df.columns:
-                display_df['impressions'] = display_df['impressions'].apply(lambda x: f"{x:,}" if pd.notna(x) else "0")
-            
-            # Search functionality
-            search_term = st.text_input("🔍 Search posts", placeholder="Enter keywords to search in post titles...")
-            
-            if search_term:
-                mask = display_df['post title (first sentence)'].str.contains(search_term, case=False, na=False)
-                display_df = display_df[mask]
-            
-            # Display the table
-            st.dataframe(
-                display_df,
-                use_container_width=True,
-                height=400
-            )
-            
-            # Download button
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="📥 Download filtered data as CSV",
-                data=csv,
-                file_name=f"linkedin_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            render_table(df, data_key)
             
             # Additional insights
             st.markdown("## 💡 Quick Insights")
@@ -346,14 +463,14 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                if 'engagement rate' in df.columns and not df['engagement rate'].empty:
-                    best_post = df.loc[df['engagement rate'].idxmax()]
+                if 'engagement rate' in df.columns and df['engagement rate'].notna().any():
+                    best_post = df.iloc[int(np.nanargmax(df['engagement rate'].to_numpy()))]
                     st.info(f"**🏆 Best Performing Post:**\n\n{best_post['post title (first sentence)']}\n\n"
                            f"Engagement Rate: {best_post['engagement rate']*100:.2f}%")
             
             with col2:
-                if 'impressions' in df.columns and not df['impressions'].empty:
-                    most_viewed = df.loc[df['impressions'].idxmax()]
+                if 'impressions' in df.columns and df['impressions'].notna().any():
+                    most_viewed = df.iloc[int(np.nanargmax(df['impressions'].to_numpy()))]
                     st.info(f"**👁️ Most Viewed Post:**\n\n{most_viewed['post title (first sentence)']}\n\n"
                            f"Impressions: {most_viewed['impressions']:,}")
     